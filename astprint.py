@@ -1,42 +1,111 @@
-from parser import AST, ASTNode, TerminalSymbol, TerminalTable, NonTerminalSymbol, NonTerminalTable
+from parser import AST, ASTNode, TerminalSymbol, TerminalTable, NonTerminalSymbol, NonTerminalTable, SymbolfromStr
 from ttoken import Token, TokenType, TT_NUMBER, TT_IDENTIFIER, TT_PLUS
-from graphviz import Digraph
+from typing import Iterator, TextIO
+import json
 import os
 
-def ast_to_png(ast: AST) -> str:
+def node_label(node: ASTNode) -> str:
+    if isinstance(node.symbol, TerminalSymbol):
+        return node.val.value()
+    elif isinstance(node.symbol, NonTerminalSymbol):
+        return NonTerminalTable[node.symbol.symbol_id]
+    else:
+        raise RuntimeError(f'Unknown symbol type: {node.symbol}')
+
+def fold_chain(node: ASTNode) -> tuple[ASTNode, str]:
     """
-    Convert the AST to a PNG image using Graphviz.
-    The image will be saved in the current working directory with the name 'ast.png'.
+        Follow single-child nonterminal chains such as Expression -> ... -> Element.
+        Returns the last node of the chain and the joined label.
     """
-    def add_nodes_edges(graph: Digraph, node: ASTNode | None):
-        node_id = str(id(node))
+    labels = [node_label(node)]
+    while (node.children is not None and len(node.children) == 1
+           and isinstance(node.children[0].symbol, NonTerminalSymbol)):
+        node = node.children[0]
+        labels.append(node_label(node))
+    return node, '/'.join(labels)
 
-        if node.children is None:
-            return
+def iter_graph(root: ASTNode, max_depth: int | None = None, fold_chains: bool = False) -> Iterator[tuple]:
+    """
+        Walk the tree iteratively in preorder, nodes get sequential integer ids.
 
-        for child in node.children:
-            child_id = str(id(child))
-            if isinstance(child.symbol, TerminalSymbol):
-                child_name = child.val.value()
-            elif isinstance(child.symbol, NonTerminalSymbol):
-                child_name = NonTerminalTable[child.symbol.symbol_id]
-            else:
-                raise RuntimeError(f'Unknown symbol type: {child.symbol}')
+        Yields ('node', id, label) and ('edge', parent_id, child_id). Children
+        below `max_depth` are dropped and their parent label is suffixed with
+        ' ...'.
+    """
+    next_id = 0
+    stack = [(root, 0, None)]
+    while stack:
+        node, depth, parent_id = stack.pop()
+        if fold_chains:
+            node, label = fold_chain(node)
+        else:
+            label = node_label(node)
 
-            graph.node(child_id, child_name)
-            graph.edge(node_id, child_id)
-            add_nodes_edges(graph, child)
+        children = node.children or []
+        if children and max_depth is not None and depth >= max_depth:
+            label += ' ...'
+            children = []
 
-    dot = Digraph(comment='二叉树可视化')
-    dot.node(str(id(ast.root)), NonTerminalTable[ast.root.symbol.symbol_id])
-    add_nodes_edges(dot, ast.root)
+        node_id = next_id
+        next_id += 1
+        yield ('node', node_id, label)
+        if parent_id is not None:
+            yield ('edge', parent_id, node_id)
 
+        for child in reversed(children):
+            stack.append((child, depth + 1, node_id))
+
+def write_dot(root: ASTNode, f: TextIO, max_depth: int | None = None, fold_chains: bool = False) -> None:
+    f.write('digraph AST {\n')
+    for kind, a, b in iter_graph(root, max_depth, fold_chains):
+        if kind == 'node':
+            escaped = b.replace('\\', '\\\\').replace('"', '\\"')
+            f.write(f'    {a} [label="{escaped}"]\n')
+        else:
+            f.write(f'    {a} -> {b}\n')
+    f.write('}\n')
+
+def write_jsonl(root: ASTNode, f: TextIO, max_depth: int | None = None, fold_chains: bool = False) -> None:
+    for kind, a, b in iter_graph(root, max_depth, fold_chains):
+        if kind == 'node':
+            f.write(json.dumps({'node': a, 'label': b}) + '\n')
+        else:
+            f.write(json.dumps({'from': a, 'to': b}) + '\n')
+
+def find_function(ast: AST, name: str) -> ASTNode | None:
+    """
+        The FunctionDeclare node of function `name`, for exporting one subtree
+    """
+    function_symbol = SymbolfromStr('FunctionDeclare')
+    stack = [ast.root]
+    while stack:
+        node = stack.pop()
+        if node.symbol == function_symbol:
+            # FunctionDeclare -> FunctionHeaderDeclare SentenceBlock, header -> fn ID ...
+            if node.children[0].children[1].val.value() == name:
+                return node
+            continue
+        stack.extend(node.children or [])
+    return None
+
+def render_dot(dot_file: str, output_file: str, format: str = 'png') -> str:
+    from graphviz import render
+    return render('dot', format, dot_file, outfile=output_file)
+
+def ast_to_png(ast: AST) -> str:
+    """
+    Convert the AST to a PNG image using Graphviz.
+    The image will be saved in the output directory with the name 'ast.png'.
+    """
     output_dir = os.path.join(os.path.curdir, 'output')
     if not os.path.exists(output_dir):
         os.makedirs(output_dir)
+    dot_file = os.path.join(output_dir, 'ast.dot')
     output_file = os.path.join(output_dir, 'ast.png')
 
-    return dot.render(outfile=output_file, format='png', cleanup=True)
+    with open(dot_file, 'w') as f:
+        write_dot(ast.root, f)
+    return render_dot(dot_file, output_file)
 
 if __name__ == "__main__":
     """
@@ -58,4 +127,3 @@ if __name__ == "__main__":
     ast_instance = AST(root_node)
     image_path = ast_to_png(ast_instance)
     print(f'AST visualization saved to: {image_path}')
-
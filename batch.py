@@ -0,0 +1,85 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from ttoken import Token
+from parser import AST, Grammar, Grammars, RustGrammar, parse_tokens
+
+def parse_batch(token_streams: list[list[Token]], grammar: Grammar = RustGrammar,
+                max_workers: int | None = None) -> list[AST]:
+    """
+        Parse token streams on a thread pool, results are in input order.
+
+        All threads share the grammar's frozen table. The first parse error is
+        raised after the pool shuts down.
+    """
+    table = Grammars.frozen_table(grammar)
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        return list(executor.map(lambda tokens: parse_tokens(grammar, table, tokens), token_streams))
+
+if __name__ == "__main__":
+    """
+    Test:
+        Hammer one shared frozen table from many threads and compare every
+        tree with a single-threaded parse.
+    """
+    import sys
+    import threading
+    from lexer import run_lexer
+    from parser import FrozenLR1Table, LR1Parser
+
+    sources = [
+        'fn a() { }',
+        'fn b(mut x: i32) -> i32 { let y = x * 2 + 1; return y; }',
+        'fn c() { while n > 0 { n = n - 1; } if a == b { f(a, b); } else { ; } }',
+        'fn d( {',  # parse error
+    ]
+    for path in sys.argv[1:]:
+        with open(path, 'r') as f:
+            sources.append(f.read())
+
+    def shape(ast: AST) -> list:
+        result = []
+        stack = [ast.root]
+        while stack:
+            node = stack.pop()
+            result.append((repr(node.symbol), node.val.value() if node.val is not None else None))
+            stack.extend(reversed(node.children or []))
+        return result
+
+    def expected(text: str):
+        try:
+            return shape(LR1Parser().parse(run_lexer(text)))
+        except Exception as e:
+            return str(e)
+
+    expectations = [expected(text) for text in sources]
+    table = Grammars.frozen_table(RustGrammar)
+    assert isinstance(table, FrozenLR1Table)
+
+    rounds = 200
+    threads = 16
+    failures = []
+    barrier = threading.Barrier(threads)
+
+    def hammer(seed: int) -> None:
+        barrier.wait()
+        for i in range(rounds):
+            k = (seed + i) % len(sources)
+            try:
+                result = shape(parse_tokens(RustGrammar, table, run_lexer(sources[k])))
+            except Exception as e:
+                result = str(e)
+            if result != expectations[k]:
+                failures.append((seed, i, k))
+
+    workers = [threading.Thread(target=hammer, args=(seed,)) for seed in range(threads)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+
+    assert not failures, f'{len(failures)} mismatched parses, first: {failures[0]}'
+    assert len(table.action_table) == len(Grammars.table(RustGrammar).kernels), 'table grew while parsing'
+
+    valid = [run_lexer(text) for text, exp in zip(sources, expectations) if not isinstance(exp, str)]
+    assert [shape(ast) for ast in parse_batch(valid * 10)] == [shape(LR1Parser().parse(t)) for t in valid * 10]
+    print(f'{threads} threads x {rounds} parses on one shared table: ok')
@@ -0,0 +1,69 @@
+import sys
+import time
+
+from lexer import run_lexer
+from parser import LR1Parser, ParserSession
+from vector_lexer import run_vector_lexer
+
+SNIPPETS = [
+    'fn a() { }',
+    'fn b(x: i32) -> i32 { return x + 1; }',
+    'fn c() { let mut y: i32 = 2 * (3 + 4); y = y - 1; }',
+    'fn d(mut n: i32) { while n > 0 { n = n - 1; } }',
+    'fn e(a: i32, b: i32) { if a == b { f(a, b); } else { ; } }',
+]
+
+def measure(func, *args, repeat: int = 3) -> float:
+    best = float('inf')
+    for _ in range(repeat):
+        begin = time.perf_counter()
+        func(*args)
+        best = min(best, time.perf_counter() - begin)
+    return best
+
+def bench_lexers(text: str) -> None:
+    size_mb = len(text) / (1 << 20)
+    print(f'Lexing {len(text)} characters')
+    for name, func in [('Lexer', run_lexer), ('VectorLexer', run_vector_lexer)]:
+        elapsed = measure(func, text)
+        print(f'  {name:<12} {elapsed:8.3f}s  {size_mb / elapsed:8.2f} MB/s')
+
+def discard(ast) -> None:
+    pass
+
+def bench_sessions(count: int = 20000) -> None:
+    """
+        Every variant drops each tree right away, so they all retain the same
+        memory and the difference is the parse itself, not GC pressure.
+    """
+    streams = [run_lexer(SNIPPETS[i % len(SNIPPETS)]) for i in range(count)]
+    parser = LR1Parser()
+    session = ParserSession(parser)
+    arena_session = ParserSession(parser, arena=True)
+
+    print(f'Parsing {count} snippets')
+    runs = [
+        ('LR1Parser.parse', lambda: [discard(parser.parse(tokens)) for tokens in streams]),
+        ('ParserSession', lambda: session.parse_many(streams, consume=discard)),
+        ('  with arena', lambda: arena_session.parse_many(streams, consume=discard)),
+    ]
+    for name, run in runs:
+        elapsed = measure(run)
+        print(f'  {name:<16} {elapsed:8.3f}s  {count / elapsed:10.0f} snippets/s')
+
+if __name__ == "__main__":
+    if len(sys.argv) == 1:
+        bench_sessions()
+        sys.exit(0)
+
+    if len(sys.argv) not in (2, 3):
+        print("Usage: python benchmark.py [<source_file> [repeat]]")
+        sys.exit(1)
+
+    with open(sys.argv[1], 'r') as f:
+        text = f.read()
+    if len(sys.argv) == 3:
+        text = (text + '\n') * int(sys.argv[2])
+
+    bench_lexers(text)
+    bench_sessions()
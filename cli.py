@@ -0,0 +1,283 @@
+"""
+    Command line entry point.
+
+    Usage:
+        python cli.py lex <source_file> [--vector]
+        python cli.py parse <source_file> [--server SOCKET]
+        python cli.py check <source_file>... [--server SOCKET | --cache DIR]
+        python cli.py render <source_file> [--format png|svg|dot|jsonl] [-o FILE]
+                             [--max-depth N] [--function NAME] [--fold]
+        python cli.py index <source_file>...
+        python cli.py serve --socket SOCKET [--cache DIR]
+
+    With `--lazy-table FILE` before the subcommand, LR(1) states are built
+    only as parsing reaches them and the explored states are kept in FILE
+    for the next run.
+
+    Only the modules a subcommand needs are imported: `lex` never builds the
+    LR(1) table and only `render` imports graphviz. `serve` keeps one built
+    parser warm behind a Unix socket so `parse` and `check` can skip startup.
+"""
+import argparse
+import asyncio
+import json
+import socket
+import sys
+
+# One request is one JSON line carrying a whole source file
+REQUEST_LIMIT = 256 << 20
+
+_parser = None
+_cache = None
+_table_file = None
+
+def get_parser():
+    global _parser
+    if _parser is None:
+        from parser import LR1Parser
+        if _table_file is not None:
+            _parser = LR1Parser(lazy=True, table_file=_table_file)
+        else:
+            _parser = LR1Parser()
+    return _parser
+
+def enable_cache(directory: str) -> None:
+    global _cache
+    from parse_cache import ParseCache
+    _cache = ParseCache(get_parser(), directory)
+
+def parse_text(text: str):
+    if _cache is not None:
+        return _cache.parse(text)[1]
+    return get_parser().parse(lex_text(text))
+
+def read_source(filename: str) -> str:
+    with open(filename, 'r') as f:
+        return f.read()
+
+def lex_text(text: str, vector: bool = False) -> list:
+    if vector:
+        from vector_lexer import run_vector_lexer
+        return run_vector_lexer(text)
+    from lexer import run_lexer
+    return run_lexer(text)
+
+def format_ast(ast) -> str:
+    from parser import TerminalSymbol
+
+    lines = []
+    stack = [(ast.root, 0)]
+    while stack:
+        node, depth = stack.pop()
+        if isinstance(node.symbol, TerminalSymbol):
+            lines.append(f'{"  " * depth}{node.symbol} `{node.val.value()}`')
+        else:
+            lines.append(f'{"  " * depth}{node.symbol}')
+        for child in reversed(node.children or []):
+            stack.append((child, depth + 1))
+    return '\n'.join(lines)
+
+def handle_request(request: dict) -> dict:
+    """
+        Serve one `parse` or `check` request, errors are reported, not raised.
+    """
+    command = request.get('command')
+    if command not in ('parse', 'check'):
+        return {'ok': False, 'error': f'Unknown command: {command}'}
+
+    try:
+        ast = parse_text(request['source'])
+    except Exception as e:
+        return {'ok': False, 'error': str(e)}
+
+    if command == 'parse':
+        return {'ok': True, 'tree': format_ast(ast)}
+    return {'ok': True}
+
+def send_request(socket_path: str, request: dict) -> dict:
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as conn:
+        conn.connect(socket_path)
+        conn.sendall(json.dumps(request).encode() + b'\n')
+        with conn.makefile('rb') as f:
+            line = f.readline()
+    if not line:
+        return {'ok': False, 'error': 'Server closed the connection without a reply'}
+    return json.loads(line)
+
+def run_request(request: dict, socket_path: str | None) -> dict:
+    if socket_path is None:
+        return handle_request(request)
+    return send_request(socket_path, request)
+
+async def serve_client(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+    loop = asyncio.get_running_loop()
+    try:
+        while True:
+            try:
+                line = await reader.readline()
+            except (ValueError, asyncio.LimitOverrunError) as e:
+                # The rest of the oversized request is unread, drop the connection
+                writer.write(json.dumps({'ok': False, 'error': f'Bad request: {e}'}).encode() + b'\n')
+                await writer.drain()
+                break
+            if not line:
+                break
+            try:
+                request = json.loads(line)
+            except json.JSONDecodeError as e:
+                response = {'ok': False, 'error': f'Bad request: {e}'}
+            else:
+                response = await loop.run_in_executor(None, handle_request, request)
+            writer.write(json.dumps(response).encode() + b'\n')
+            await writer.drain()
+    finally:
+        writer.close()
+
+async def serve(socket_path: str) -> None:
+    get_parser()
+    server = await asyncio.start_unix_server(serve_client, path=socket_path, limit=REQUEST_LIMIT)
+    print(f'Serving on {socket_path}')
+    async with server:
+        await server.serve_forever()
+
+def cmd_lex(args) -> int:
+    for token in lex_text(read_source(args.source), args.vector):
+        location = token.location()
+        print(f'{location[0]}:{location[1]}\t{token}')
+    return 0
+
+def cmd_parse(args) -> int:
+    response = run_request({'command': 'parse', 'source': read_source(args.source)}, args.server)
+    if not response['ok']:
+        print(f'{args.source}: {response["error"]}', file=sys.stderr)
+        return 1
+    print(response['tree'])
+    return 0
+
+def cmd_check(args) -> int:
+    if args.cache is not None and args.server is None:
+        enable_cache(args.cache)
+
+    status = 0
+    for source in args.sources:
+        response = run_request({'command': 'check', 'source': read_source(source)}, args.server)
+        if response['ok']:
+            print(f'{source}: ok')
+        else:
+            print(f'{source}: {response["error"]}', file=sys.stderr)
+            status = 1
+    return status
+
+def cmd_render(args) -> int:
+    import os
+    import tempfile
+    from astprint import find_function, render_dot, write_dot, write_jsonl
+
+    ast = parse_text(read_source(args.source))
+    root = ast.root
+    if args.function is not None:
+        root = find_function(ast, args.function)
+        if root is None:
+            print(f'{args.source}: no function `{args.function}`', file=sys.stderr)
+            return 1
+
+    output = args.output or os.path.join(os.path.curdir, 'output', f'ast.{args.format}')
+    os.makedirs(os.path.dirname(output) or os.path.curdir, exist_ok=True)
+
+    if args.format == 'jsonl':
+        with open(output, 'w') as f:
+            write_jsonl(root, f, args.max_depth, args.fold)
+    elif args.format == 'dot':
+        with open(output, 'w') as f:
+            write_dot(root, f, args.max_depth, args.fold)
+    else:
+        with tempfile.NamedTemporaryFile('w', suffix='.dot', delete=False) as f:
+            write_dot(root, f, args.max_depth, args.fold)
+        try:
+            output = render_dot(f.name, output, args.format)
+        finally:
+            os.remove(f.name)
+
+    print(f'AST exported to: {output}')
+    return 0
+
+def cmd_index(args) -> int:
+    from skim import skim_signatures
+
+    status = 0
+    for source in args.sources:
+        try:
+            signatures = skim_signatures(read_source(source), get_parser())
+        except Exception as e:
+            print(f'{source}: {e}', file=sys.stderr)
+            status = 1
+            continue
+        for signature in signatures:
+            print(f'{source}:{signature.line}:{signature.column}\t{signature}')
+    return status
+
+def cmd_serve(args) -> int:
+    global _parser
+    if _table_file is None:
+        # Requests are parsed on executor threads, share the immutable table
+        from parser import LR1Parser
+        _parser = LR1Parser(frozen=True)
+    if args.cache is not None:
+        enable_cache(args.cache)
+    try:
+        asyncio.run(serve(args.socket))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+def main(argv: list[str] | None = None) -> int:
+    global _table_file
+
+    arg_parser = argparse.ArgumentParser(prog='lexsyn')
+    arg_parser.add_argument('--lazy-table', metavar='FILE', help='build parser states on demand, kept in FILE')
+    subparsers = arg_parser.add_subparsers(dest='command', required=True)
+
+    lex = subparsers.add_parser('lex', help='print the token stream')
+    lex.add_argument('source')
+    lex.add_argument('--vector', action='store_true', help='use the NumPy lexer')
+    lex.set_defaults(func=cmd_lex)
+
+    parse = subparsers.add_parser('parse', help='print the syntax tree')
+    parse.add_argument('source')
+    parse.add_argument('--server', metavar='SOCKET', help='parse on a running server')
+    parse.set_defaults(func=cmd_parse)
+
+    check = subparsers.add_parser('check', help='report syntax errors')
+    check.add_argument('sources', nargs='+')
+    check.add_argument('--server', metavar='SOCKET', help='check on a running server')
+    check.add_argument('--cache', metavar='DIR', help='reuse parse results stored in DIR')
+    check.set_defaults(func=cmd_check)
+
+    render = subparsers.add_parser('render', help='export the syntax tree as an image, DOT or JSON lines')
+    render.add_argument('source')
+    render.add_argument('--format', choices=['png', 'svg', 'dot', 'jsonl'], default='png')
+    render.add_argument('-o', '--output', metavar='FILE')
+    render.add_argument('--max-depth', type=int, metavar='N')
+    render.add_argument('--function', metavar='NAME', help='export only this function')
+    render.add_argument('--fold', action='store_true', help='fold single-child nonterminal chains')
+    render.set_defaults(func=cmd_render)
+
+    index = subparsers.add_parser('index', help='list function signatures without parsing bodies')
+    index.add_argument('sources', nargs='+')
+    index.set_defaults(func=cmd_index)
+
+    serve = subparsers.add_parser('serve', help='keep a parser warm behind a Unix socket')
+    serve.add_argument('--socket', required=True)
+    serve.add_argument('--cache', metavar='DIR', help='reuse parse results stored in DIR')
+    serve.set_defaults(func=cmd_serve)
+
+    args = arg_parser.parse_args(argv)
+    _table_file = args.lazy_table
+    try:
+        return args.func(args)
+    finally:
+        if _table_file is not None and _parser is not None:
+            _parser.lr1_table.save(_table_file)
+
+if __name__ == "__main__":
+    sys.exit(main())
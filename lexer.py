@@ -1,6 +1,8 @@
+import re
 from typing import Callable
 
-from ttoken import Token
+from ttoken import Token, TokenType
+from lineindex import LineIndex
 import ttoken as tt
 
 KEYWORDS = {
@@ -19,16 +21,31 @@ KEYWORDS = {
     "continue": tt.TT_CONTINUE,
 }
 
+# Matches the comments skip_comment consumes: `//` runs to the newline, `/*`
+# to the first `*/` after it (or to EOF when unterminated, which is an error).
+COMMENT_PATTERN = re.compile(r'//[^\n]*|/\*.*?(?:\*/|\Z)', re.S)
+
 class Lexer:
-    def __init__(self, text: str):
+    def __init__(self, text: str, start: int = 0, end: int | None = None):
+        """
+            Lexes text[start:end], token positions stay relative to `text`
+        """
         self.tokens: list[Token] = []
         self.text = text
-        self.pos = 0
+        self.end = len(text) if end is None else end
+        self.pos = start
+        self.line_index = LineIndex(text)
         self.current_char = self.getchar()
     
     def getchar_at(self, pos: int) -> str | None:
-        return self.text[pos] if pos < len(self.text) else None
+        return self.text[pos] if pos < self.end else None
     
+    def describe(self, pos: int) -> str:
+        return self.line_index.describe(pos)
+
+    def make_token(self, type: TokenType, value: str, pos: int) -> Token:
+        return Token(type, value, pos, self.line_index)
+
     def getchar(self) -> str | None:
         return self.getchar_at(self.pos)
 
@@ -64,7 +81,7 @@ class Lexer:
                     break
                 self.advance()
             else:
-                raise ValueError(f'Unterminated multi-line comment at position {self.pos}')
+                raise ValueError(f'Unterminated multi-line comment at {self.describe(self.pos)}')
 
             return True
         
@@ -72,13 +89,14 @@ class Lexer:
 
     def make_number(self) -> Token:
         num_str = ""
+        start = self.pos
 
         if self.current_char is None:
-            raise RuntimeError("Unexpected EOF while reading number at position {self.pos}.")
+            raise RuntimeError(f"Unexpected EOF while reading number at {self.describe(self.pos)}.")
 
         while self.current_char is not None:
             if self.current_char.isalpha():
-                raise ValueError(f"Unexpected `{self.current_char}` in number at position {self.pos}.")
+                raise ValueError(f"Unexpected `{self.current_char}` in number at {self.describe(self.pos)}.")
 
             if not self.current_char.isdigit():
                 break
@@ -86,23 +104,24 @@ class Lexer:
             num_str += self.current_char
             self.advance()
 
-        return Token(tt.TT_NUMBER, num_str)
+        return self.make_token(tt.TT_NUMBER, num_str, start)
 
     def make_identifier_or_keyword(self) -> Token:
         ident_str = ''
+        start = self.pos
 
         if self.current_char is None:
-            raise RuntimeError("Unexpected EOF while reading identifier or keyword at position {self.pos}.")
+            raise RuntimeError(f"Unexpected EOF while reading identifier or keyword at {self.describe(self.pos)}.")
         
         if not (self.current_char.isalpha() or self.current_char == '_'):
-            raise RuntimeError(f"Unexpected `{self.current_char}` at position {self.pos}.")
+            raise RuntimeError(f"Unexpected `{self.current_char}` at {self.describe(self.pos)}.")
 
         while self.current_char is not None and (self.current_char.isalnum() or self.current_char == '_'):
             ident_str += self.current_char
             self.advance()
         
         token_type = KEYWORDS.get(ident_str, tt.TT_IDENTIFIER)
-        return Token(token_type, ident_str)
+        return self.make_token(token_type, ident_str, start)
 
     def tokenize(self) -> list[Token]:
         while self.current_char is not None:
@@ -123,27 +142,27 @@ class Lexer:
 
             # Two-character tokens
             if self.current_char == '=' and self.peek() == '=':
-                self.tokens.append(Token(tt.TT_EQ, '=='))
+                self.tokens.append(self.make_token(tt.TT_EQ, '==', self.pos))
                 self.advance(2)
                 continue
             elif self.current_char == '>' and self.peek() == '=':
-                self.tokens.append(Token(tt.TT_GTE, '>='))
+                self.tokens.append(self.make_token(tt.TT_GTE, '>=', self.pos))
                 self.advance(2)
                 continue
             elif self.current_char == '<' and self.peek() == '=':
-                self.tokens.append(Token(tt.TT_LTE, '<='))
+                self.tokens.append(self.make_token(tt.TT_LTE, '<=', self.pos))
                 self.advance(2)
                 continue
             elif self.current_char == '!' and self.peek() == '=':
-                self.tokens.append(Token(tt.TT_NE, '!='))
+                self.tokens.append(self.make_token(tt.TT_NE, '!=', self.pos))
                 self.advance(2)
                 continue
             elif self.current_char == '-' and self.peek() == '>':
-                self.tokens.append(Token(tt.TT_ARROW, '->'))
+                self.tokens.append(self.make_token(tt.TT_ARROW, '->', self.pos))
                 self.advance(2)
                 continue
             elif self.current_char == '.' and self.peek() == '.':
-                self.tokens.append(Token(tt.TT_DOTDOT, '..'))
+                self.tokens.append(self.make_token(tt.TT_DOTDOT, '..', self.pos))
                 self.advance(2)
                 continue
             
@@ -159,13 +178,13 @@ class Lexer:
 
             if self.current_char in single_char_map:
                 token_type = single_char_map[self.current_char]
-                self.tokens.append(Token(token_type, self.current_char))
+                self.tokens.append(self.make_token(token_type, self.current_char, self.pos))
                 self.advance()
                 continue
             
-            raise ValueError(f"Unknown `{self.current_char}` at position {self.pos}")
+            raise ValueError(f"Unknown `{self.current_char}` at {self.describe(self.pos)}")
         
-        self.tokens.append(Token(tt.TT_END, '$'))
+        self.tokens.append(self.make_token(tt.TT_END, '$', self.pos))
         return self.tokens
 
 
@@ -0,0 +1,36 @@
+from array import array
+from bisect import bisect_right
+
+class LineIndex:
+    """
+        Maps character offsets of a source text to (line, column) pairs.
+
+        The table of line-start offsets is built lazily on first lookup with
+        `str.find`, so lexing never counts lines character by character.
+        Lines and columns are 1-based.
+    """
+    def __init__(self, text: str):
+        self.text = text
+        self._line_starts: array | None = None
+
+    def line_starts(self) -> array:
+        if self._line_starts is None:
+            starts = array('q', [0])
+            pos = self.text.find('\n')
+            while pos != -1:
+                starts.append(pos + 1)
+                pos = self.text.find('\n', pos + 1)
+            self._line_starts = starts
+        return self._line_starts
+
+    def line_count(self) -> int:
+        return len(self.line_starts())
+
+    def location(self, pos: int) -> tuple[int, int]:
+        starts = self.line_starts()
+        line = bisect_right(starts, pos) - 1
+        return line + 1, pos - starts[line] + 1
+
+    def describe(self, pos: int) -> str:
+        line, column = self.location(pos)
+        return f'position {pos} (line {line}, column {column})'
@@ -0,0 +1,121 @@
+import re
+from bisect import bisect_right
+from concurrent.futures import ProcessPoolExecutor
+import os
+
+from ttoken import Token, TOKEN_TYPE_BY_ID
+from lexer import COMMENT_PATTERN, Lexer, run_lexer
+from lineindex import LineIndex
+import ttoken as tt
+
+WHITESPACE_PATTERN = re.compile(r'\s')
+
+MIN_CHUNK_SIZE = 1 << 20
+
+def scan_comments(text: str) -> tuple[list[int], list[int]]:
+    """
+        Pre-scan for comment spans, returns (starts, ends) sorted by start
+    """
+    starts, ends = [], []
+    for m in COMMENT_PATTERN.finditer(text):
+        starts.append(m.start())
+        ends.append(m.end())
+    return starts, ends
+
+def find_split_points(text: str, count: int) -> list[int]:
+    """
+        Pick up to `count - 1` offsets where a fresh Lexer is in its initial state.
+
+        A whitespace character outside every comment never belongs to a token,
+        so lexing on either side of it independently gives the serial result.
+    """
+    starts, ends = scan_comments(text)
+    splits = []
+    last = 0
+
+    for i in range(1, count):
+        pos = max(len(text) * i // count, last + 1)
+        while pos < len(text):
+            m = WHITESPACE_PATTERN.search(text, pos)
+            if m is None:
+                pos = len(text)
+                break
+            pos = m.start()
+
+            idx = bisect_right(starts, pos) - 1
+            if idx >= 0 and pos < ends[idx]:
+                pos = ends[idx]
+                continue
+            break
+
+        if pos >= len(text):
+            break
+        splits.append(pos)
+        last = pos
+
+    return splits
+
+def _lex_chunk(chunk: str) -> list[tuple[int, str, int]]:
+    tokens = Lexer(chunk).tokenize()
+    tokens.pop()  # TT_END belongs to the whole input, not to the chunk
+    return [(token.type().id, token.value(), token.pos()) for token in tokens]
+
+def run_lexer_parallel(text: str, workers: int | None = None, min_chunk_size: int = MIN_CHUNK_SIZE) -> list[Token]:
+    """
+        Lex `text` in worker processes, output is identical to `run_lexer(text)`.
+
+        Inputs smaller than two chunks are lexed serially. If any chunk fails,
+        the whole input is re-lexed serially so the error is the same as well.
+    """
+    if workers is None:
+        workers = os.cpu_count() or 1
+    count = min(workers, len(text) // min_chunk_size)
+    if count <= 1:
+        return run_lexer(text)
+
+    bounds = [0] + find_split_points(text, count) + [len(text)]
+    chunks = [text[bounds[i]:bounds[i + 1]] for i in range(len(bounds) - 1)]
+
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(_lex_chunk, chunks))
+    except (ValueError, RuntimeError):
+        return run_lexer(text)
+
+    line_index = LineIndex(text)
+    tokens: list[Token] = []
+    for base, result in zip(bounds, results):
+        for type_id, value, pos in result:
+            tokens.append(Token(TOKEN_TYPE_BY_ID[type_id], value, base + pos, line_index))
+
+    tokens.append(Token(tt.TT_END, '$', len(text), line_index))
+    return tokens
+
+if __name__ == "__main__":
+    """
+    Test:
+        Lex a source file in parallel and compare with the serial lexer.
+    """
+    import sys
+    import time
+
+    if len(sys.argv) not in (2, 3):
+        print("Usage: python parallel_lexer.py <source_file> [repeat]")
+        sys.exit(1)
+
+    with open(sys.argv[1], 'r') as f:
+        text = f.read()
+    if len(sys.argv) == 3:
+        text = (text + '\n') * int(sys.argv[2])
+
+    begin = time.perf_counter()
+    serial = run_lexer(text)
+    serial_time = time.perf_counter() - begin
+
+    begin = time.perf_counter()
+    parallel = run_lexer_parallel(text, min_chunk_size=1 << 16)
+    parallel_time = time.perf_counter() - begin
+
+    key = lambda token: (token.type(), token.value(), token.pos())
+    assert list(map(key, serial)) == list(map(key, parallel)), 'token streams differ'
+    print(f'{len(serial)} tokens, serial {serial_time:.3f}s, parallel {parallel_time:.3f}s')
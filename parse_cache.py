@@ -0,0 +1,268 @@
+from array import array
+from collections import OrderedDict
+import hashlib
+import os
+import struct
+import sys
+import tempfile
+import threading
+
+from ttoken import Token, TOKEN_TYPE_BY_ID
+from lexer import run_lexer
+from lineindex import LineIndex
+from parser import AST, ASTNode, LR1Parser, NonTerminalSymbol, NonTerminalTable, TerminalSymbol, TerminalTable
+
+FORMAT_VERSION = 1
+MAGIC = b'LXSC'
+HEADER = struct.Struct('<4sHIII')   # magic, version, tokens, nodes, value bytes
+
+def encode(tokens: list[Token], ast: AST) -> bytes:
+    """
+        Serialize a token stream and its AST.
+
+        Tokens are stored as parallel arrays of type ids, offsets and value
+        offsets into one string. The tree is a preorder array of symbol codes
+        (id * 2 + is_terminal) with child counts; the n-th terminal leaf is the
+        n-th token, so leaves need no token references. A child count of zero
+        means `children is None`, reductions never produce an empty list.
+    """
+    types = array('H', (token.type().id for token in tokens))
+    positions = array('q', (token.pos() for token in tokens))
+    value_offsets = array('I', [0])
+    values = []
+    offset = 0
+    for token in tokens:
+        offset += len(token.value())
+        value_offsets.append(offset)
+        values.append(token.value())
+    value_bytes = ''.join(values).encode()
+
+    codes = array('H')
+    child_counts = array('I')
+    stack = [ast.root]
+    while stack:
+        node = stack.pop()
+        if isinstance(node.symbol, TerminalSymbol):
+            codes.append(node.symbol.symbol_id * 2 + 1)
+        else:
+            codes.append(node.symbol.symbol_id * 2)
+        children = node.children or []
+        child_counts.append(len(children))
+        stack.extend(reversed(children))
+
+    return b''.join([
+        HEADER.pack(MAGIC, FORMAT_VERSION, len(tokens), len(codes), len(value_bytes)),
+        types.tobytes(), positions.tobytes(), value_offsets.tobytes(), value_bytes,
+        codes.tobytes(), child_counts.tobytes(),
+    ])
+
+def decode(data: bytes, text: str) -> tuple[list[Token], AST]:
+    """
+        Inverse of `encode`, raises ValueError or struct.error on a damaged entry
+    """
+    magic, version, token_count, node_count, value_size = HEADER.unpack_from(data)
+    if magic != MAGIC or version != FORMAT_VERSION:
+        raise ValueError('Not a parse cache entry of this version')
+
+    offset = HEADER.size
+    def take(typecode: str, count: int) -> array:
+        nonlocal offset
+        result = array(typecode)
+        size = result.itemsize * count
+        if offset + size > len(data):
+            raise ValueError('Truncated parse cache entry')
+        result.frombytes(data[offset:offset + size])
+        offset += size
+        return result
+
+    types = take('H', token_count)
+    positions = take('q', token_count)
+    value_offsets = take('I', token_count + 1).tolist()
+    if offset + value_size > len(data):
+        raise ValueError('Truncated parse cache entry')
+    values = data[offset:offset + value_size].decode()
+    offset += value_size
+    codes = take('H', node_count)
+    child_counts = take('I', node_count)
+
+    line_index = LineIndex(text)
+    tokens = [
+        Token(TOKEN_TYPE_BY_ID[type_id], values[value_offsets[i]:value_offsets[i + 1]], pos, line_index)
+        for i, (type_id, pos) in enumerate(zip(types, positions))
+    ]
+
+    terminals = [TerminalSymbol(i) for i in range(len(TerminalTable))]
+    non_terminals = [NonTerminalSymbol(i) for i in range(len(NonTerminalTable))]
+
+    # Rebuild from preorder: each pending entry is (children list, remaining)
+    root = None
+    pending = []
+    next_token = 0
+    for code, count in zip(codes, child_counts):
+        if code & 1:
+            node = ASTNode(terminals[code >> 1], None, tokens[next_token])
+            next_token += 1
+        else:
+            node = ASTNode(non_terminals[code >> 1], [] if count else None)
+
+        if pending:
+            children, remaining = pending[-1]
+            children.append(node)
+            if remaining == 1:
+                pending.pop()
+            else:
+                pending[-1] = (children, remaining - 1)
+        else:
+            root = node
+
+        if count:
+            pending.append((node.children, count))
+
+    if root is None or pending or next_token != len(tokens) - 1:
+        raise ValueError('Inconsistent parse cache entry')
+    return tokens, AST(root)
+
+class ParseCache:
+    """
+        Content-addressed cache of (tokens, AST) with a memory and a disk tier.
+
+        Entries are keyed by the source bytes and the grammar fingerprint. The
+        memory tier keeps the most recently used results, the disk tier keeps
+        encoded entries and evicts the least recently used files once it grows
+        past `max_disk_bytes`, down to `low_water_bytes`. Results from the
+        memory tier are shared, callers must not mutate them.
+
+        One cache may be used from several threads, and several processes may
+        share a directory: a file that vanishes or cannot be decoded is a miss.
+    """
+    def __init__(self, parser: LR1Parser, directory: str | None = None,
+                 max_disk_bytes: int = 256 << 20, max_memory_entries: int = 128):
+        self.parser = parser
+        self.directory = directory
+        self.max_disk_bytes = max_disk_bytes
+        self.low_water_bytes = max_disk_bytes * 3 // 4
+        self.max_memory_entries = max_memory_entries
+        self.memory: OrderedDict[str, tuple[list[Token], AST]] = OrderedDict()
+        self.lock = threading.Lock()
+        self.fingerprint = f'{parser.grammar.fingerprint()}:{FORMAT_VERSION}:{sys.byteorder}'
+        self.disk_usage = 0
+        if directory is not None:
+            os.makedirs(directory, exist_ok=True)
+            self.disk_usage = sum(size for _, size, _ in self.scan())
+
+    def key(self, text: str) -> str:
+        h = hashlib.sha256(self.fingerprint.encode())
+        h.update(text.encode())
+        return h.hexdigest()
+
+    def path(self, key: str) -> str:
+        return os.path.join(self.directory, key + '.lxsc')
+
+    def get(self, text: str) -> tuple[list[Token], AST] | None:
+        key = self.key(text)
+        with self.lock:
+            result = self.memory.get(key)
+            if result is not None:
+                self.memory.move_to_end(key)
+                return result
+
+        if self.directory is None:
+            return None
+        path = self.path(key)
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+        except FileNotFoundError:
+            return None
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            pass
+
+        try:
+            result = decode(data, text)
+        except (ValueError, IndexError, struct.error):
+            self.discard(path, len(data))
+            return None
+
+        self.remember(key, result)
+        return result
+
+    def put(self, text: str, tokens: list[Token], ast: AST) -> None:
+        key = self.key(text)
+        self.remember(key, (tokens, ast))
+
+        if self.directory is None:
+            return
+        data = encode(tokens, ast)
+        path = self.path(key)
+        fd, temp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        try:
+            replaced = os.stat(path).st_size
+        except FileNotFoundError:
+            replaced = 0
+        os.replace(temp_path, path)
+
+        with self.lock:
+            self.disk_usage += len(data) - replaced
+            over_limit = self.disk_usage > self.max_disk_bytes
+        if over_limit:
+            self.evict()
+
+    def remember(self, key: str, result: tuple[list[Token], AST]) -> None:
+        with self.lock:
+            self.memory[key] = result
+            self.memory.move_to_end(key)
+            while len(self.memory) > self.max_memory_entries:
+                self.memory.popitem(last=False)
+
+    def discard(self, path: str, size: int) -> None:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            return
+        with self.lock:
+            self.disk_usage -= size
+
+    def scan(self) -> list[tuple[float, int, str]]:
+        """
+            (mtime, size, path) of every entry, skipping files removed meanwhile
+        """
+        entries = []
+        with os.scandir(self.directory) as it:
+            for entry in it:
+                if entry.name.endswith('.lxsc'):
+                    try:
+                        stat = entry.stat()
+                    except FileNotFoundError:
+                        continue
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+        return entries
+
+    def evict(self) -> None:
+        # Rescanning also picks up what other processes wrote or removed
+        entries = self.scan()
+        total = sum(size for _, size, _ in entries)
+
+        entries.sort()
+        for _, size, path in entries:
+            if total <= self.low_water_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+
+        with self.lock:
+            self.disk_usage = total
+
+    def parse(self, text: str) -> tuple[list[Token], AST]:
+        result = self.get(text)
+        if result is None:
+            tokens = run_lexer(text)
+            result = (tokens, self.parser.parse(tokens))
+            self.put(text, *result)
+        return result
@@ -1,6 +1,11 @@
 from collections import defaultdict
+from types import MappingProxyType
+import hashlib
+import json
+import os
+import tempfile
+import threading
 from lexer import Token
-import graphviz
 
 # Must have "Empty" "Program"
 NonTerminalTable = [
@@ -122,9 +127,21 @@ class Grammar:
         self.non_terminal_symbols = NonTerminalTable
         self.emptyable_set = set() # {NonTerminalSymbol}
         self.first_set = {} # {Symbol: set[TernimalSymbol]}
+        self.analyzed = False
     
+    def fingerprint(self) -> str:
+        """
+            Digest of the symbol tables and productions, equal grammars build equal tables
+        """
+        material = repr((self.terminal_symbols, self.non_terminal_symbols, self.productions, self.start_symbol))
+        return hashlib.sha256(material.encode()).hexdigest()
+
+    def analyze(self):
+        if not self.analyzed:
+            self.compute_first_set()
+
     def compute_first_set(self):
-        self.emptyable_set.add(SymbolfromStr("Empty"))
+        self.emptyable_set = {SymbolfromStr("Empty")}
 
         for t in self.terminal_symbols:
             t = SymbolfromStr(t)
@@ -137,31 +154,74 @@ class Grammar:
         while changed:
             changed = False
             for p in self.productions:
-                A = p.left
-
-                # For a production A -> Y1 Y2 ... Yk
-                # Add First(Y1) to First(A).
-                # If Y1 is emptyable, add First(Y2) to First(A).
-                # Continue this for Y3, ..., Yk if Y1, ..., Yi-1 are all emptyable.
-                for idx, Y in enumerate(p.right):
-                    if isinstance(Y, TerminalSymbol):
-                        if Y not in self.first_set[A]:
-                            self.first_set[A].add(Y)
+                if self.apply_production(p):
+                    changed = True
+
+        self.analyzed = True
+
+    def apply_production(self, p: Production) -> bool:
+        """
+            Propagate FIRST and emptyability through one production, True if First(A) changed
+        """
+        A = p.left
+        changed = False
+
+        # For a production A -> Y1 Y2 ... Yk
+        # Add First(Y1) to First(A).
+        # If Y1 is emptyable, add First(Y2) to First(A).
+        # Continue this for Y3, ..., Yk if Y1, ..., Yi-1 are all emptyable.
+        for idx, Y in enumerate(p.right):
+            if isinstance(Y, TerminalSymbol):
+                if Y not in self.first_set[A]:
+                    self.first_set[A].add(Y)
+                    changed = True
+                break
+            else:
+                if Y == SymbolfromStr("Empty"):
+                    if len(p.right) == idx + 1 and A not in self.emptyable_set:
+                        self.emptyable_set.add(A) 
+                        changed = True
+                else:
+                    for terminal_in_first_Y in self.first_set[Y]:
+                        if terminal_in_first_Y not in self.first_set[A]:
+                            self.first_set[A].add(terminal_in_first_Y)
                             changed = True
+                
+                    if not Y in self.emptyable_set:
                         break
-                    else:
-                        if Y == SymbolfromStr("Empty"):
-                            if len(p.right) == idx + 1 and A not in self.emptyable_set:
-                                self.emptyable_set.add(A) 
-                                changed = True
-                        else:
-                            for terminal_in_first_Y in self.first_set[Y]:
-                                if terminal_in_first_Y not in self.first_set[A]:
-                                    self.first_set[A].add(terminal_in_first_Y)
-                                    changed = True
-                        
-                            if not Y in self.emptyable_set:
-                                break
+
+        return changed
+
+    def extended(self, productions: list[list[str]]) -> 'Grammar':
+        """
+            A new grammar with `productions` appended, existing production indices are kept.
+
+            If this grammar is analyzed, FIRST sets are copied and only the
+            symbols reachable from the new productions are recomputed.
+        """
+        grammar = Grammar(productions, str(self.start_symbol))
+        added = grammar.productions
+        grammar.productions = self.productions + added
+
+        if self.analyzed:
+            grammar.emptyable_set = set(self.emptyable_set)
+            grammar.first_set = {symbol: set(first) for symbol, first in self.first_set.items()}
+            grammar.update_first_set(added)
+            grammar.analyzed = True
+        return grammar
+
+    def update_first_set(self, productions: list[Production]) -> None:
+        # Worklist over productions whose right side mentions a changed symbol
+        dependents = defaultdict(list)
+        for p in self.productions:
+            for Y in set(p.right):
+                dependents[Y].append(p)
+
+        work = list(productions)
+        while work:
+            p = work.pop()
+            if self.apply_production(p):
+                work.extend(dependents[p.left])
 
 # Make sure start symbol(Program) is in 0 and only one
 RustGrammar = Grammar([
@@ -253,7 +313,8 @@ RustGrammar = Grammar([
 ])
 
 class LR1Item:
-    def __init__(self, production_idx: int, dot_pos: int, lookahead_symbols: set[TerminalSymbol]):
+    def __init__(self, grammar: Grammar, production_idx: int, dot_pos: int, lookahead_symbols: set[TerminalSymbol]):
+        self.grammar = grammar
         self.production_idx = production_idx
         self.dot_pos = dot_pos
         self.lookahead_symbols = lookahead_symbols
@@ -272,7 +333,7 @@ class LR1Item:
         """
         [Left -> Alpha . Beta, {lookahead1, lookahead2, ...}]
         """
-        prod = RustGrammar.productions[self.production_idx]
+        prod = self.grammar.productions[self.production_idx]
         if prod is None:
             prod_str = f"Production(idx={self.production_idx} not found, dot_pos={self.dot_pos})"
         else:
@@ -288,11 +349,11 @@ class LR1Item:
         return f"[{prod_str}, {{{lookaheads_str}}}]"
 
     def is_reducible(self):
-        return self.dot_pos == len(RustGrammar.productions[self.production_idx])
+        return self.dot_pos == len(self.grammar.productions[self.production_idx])
 
 
     def is_special_empty(self):
-        production = RustGrammar.productions[self.production_idx]
+        production = self.grammar.productions[self.production_idx]
         if self.dot_pos == len(production) - 1:
             if production.right[self.dot_pos] == SymbolfromStr("Empty"):
                 return True
@@ -323,9 +384,11 @@ class LR1Action:
         return self.action_type == 2
 
 class LR1Table:
-    def __init__(self, action_table: dict, goto_table: dict):
+    def __init__(self, action_table: dict, goto_table: dict, kernels: list | None = None, states: list | None = None):
         self.action_table = action_table  # {state: {token_id: action}}
         self.goto_table = goto_table    # {state: {nonterminal_id: next_state_id}} 
+        self.kernels = kernels  # [frozenset[LR1Item]], indexed by state id, None for unused ids
+        self.states = states    # [LR1State], same indexing
     
     def __repr__(self):
         return f"LR1Table(\n    {self.action_table}\n   {self.goto_table}\n)"
@@ -359,17 +422,21 @@ class LR1State:
                 items.add((item.production_idx, frozenset(item.lookahead_symbols))) 
         return items
 
-def state_transform(state: LR1State, symbol):
+def kernel_transform(grammar: Grammar, state: LR1State, symbol) -> frozenset[LR1Item]:
     new_items = set()
     for item in state.items:
         production_idx, dot_pos, lookahead_symbols = item.production_idx, item.dot_pos, item.lookahead_symbols
-        if dot_pos < len(RustGrammar.productions[production_idx]):
-            if RustGrammar.productions[production_idx].right[dot_pos] == symbol:
-                new_item = LR1Item(production_idx, dot_pos + 1, lookahead_symbols)
+        if dot_pos < len(grammar.productions[production_idx]):
+            if grammar.productions[production_idx].right[dot_pos] == symbol:
+                new_item = LR1Item(grammar, production_idx, dot_pos + 1, lookahead_symbols)
                 new_items.add(new_item)
-    return LR1State(closure(new_items)) if new_items else None
+    return frozenset(new_items)
 
-def get_first(symstr: list, lookhead: set[TerminalSymbol]):
+def state_transform(grammar: Grammar, state: LR1State, symbol):
+    new_items = kernel_transform(grammar, state, symbol)
+    return LR1State(closure(grammar, new_items)) if new_items else None
+
+def get_first(grammar: Grammar, symstr: list, lookhead: set[TerminalSymbol]):
     can_be_empty = True
     first_set = set() 
     for sym in symstr:
@@ -378,9 +445,9 @@ def get_first(symstr: list, lookhead: set[TerminalSymbol]):
             can_be_empty = False
             break
         elif isinstance(sym, NonTerminalSymbol):
-            for terminal in RustGrammar.first_set[sym]:
+            for terminal in grammar.first_set[sym]:
                 first_set.add(terminal) 
-            if not sym in RustGrammar.emptyable_set:
+            if not sym in grammar.emptyable_set:
                 can_be_empty = False
                 break
         else:
@@ -392,7 +459,7 @@ def get_first(symstr: list, lookhead: set[TerminalSymbol]):
     return first_set
     
 
-def closure(items: set[LR1Item]):
+def closure(grammar: Grammar, items: set[LR1Item]):
     closure_set = set(items)
     changed = True
     while changed:
@@ -401,15 +468,15 @@ def closure(items: set[LR1Item]):
         for item in closure_set:
             prod_idx, dot_pos, lookahead = item.production_idx, item.dot_pos, item.lookahead_symbols
             
-            if dot_pos < len(RustGrammar.productions[prod_idx]):
-                current_symbol = RustGrammar.productions[prod_idx].right[dot_pos]
+            if dot_pos < len(grammar.productions[prod_idx]):
+                current_symbol = grammar.productions[prod_idx].right[dot_pos]
 
                 # for [A -> alpha . B beta, a]
                 # Add [B -> . gamma, b]
                 if isinstance(current_symbol, NonTerminalSymbol):
-                    for idx, production in enumerate(RustGrammar.productions):
+                    for idx, production in enumerate(grammar.productions):
                         if production.left == current_symbol:
-                            new_item = LR1Item(idx, 0, get_first(RustGrammar.productions[prod_idx].right[dot_pos + 1:], lookahead))
+                            new_item = LR1Item(grammar, idx, 0, get_first(grammar, grammar.productions[prod_idx].right[dot_pos + 1:], lookahead))
                             if new_item not in closure_set:
                                 new_items.add(new_item)
                                 changed = True
@@ -418,70 +485,311 @@ def closure(items: set[LR1Item]):
     return closure_set
 
 class LR1TableBuilder:
+    """
+        Builds the canonical LR(1) collection.
+
+        States are identified by their kernel (the items that are not added by
+        closure), which determines the closure, so a state's rows can be
+        computed from its kernel alone.
+    """
+    def __init__(self, grammar: Grammar):
+        self.grammar = grammar
+
+    def initial_kernel(self) -> frozenset[LR1Item]:
+        return frozenset([LR1Item(self.grammar, 0, 0, {SymbolfromStr('$')})])
+
+    def state_rows(self, state: LR1State, state_id) -> tuple[dict, dict]:
+        """
+            ACTION and GOTO rows of `state`, `state_id(kernel)` numbers the successors
+        """
+        grammar = self.grammar
+        action_row = {}
+        goto_row = {}
+
+        items = state.get_reducible()
+        for production_idx, lookahead_symbols in items:
+            for symbol in lookahead_symbols:
+                action_row[symbol] = LR1Action(1, production_idx)
+        
+        items = state.get_special_empty()
+        for production_idx, lookahead_symbols in items:
+            for symbol in lookahead_symbols:
+                action_row[symbol] = LR1Action(2, None)
+
+        for symbol in grammar.terminal_symbols:
+            symbol = SymbolfromStr(symbol)
+            next_kernel = kernel_transform(grammar, state, symbol)
+            if next_kernel:
+                next_state_id = state_id(next_kernel)
+                if symbol in action_row:
+                    raise Exception("Build error") 
+                action_row[symbol] = LR1Action(0, next_state_id)
+
+        for symbol in grammar.non_terminal_symbols:
+            symbol = SymbolfromStr(symbol)
+            next_kernel = kernel_transform(grammar, state, symbol)
+            if next_kernel:
+                next_state_id = state_id(next_kernel)
+                if symbol in goto_row:
+                    raise Exception("Build error") 
+                goto_row[symbol] = next_state_id
+
+        return action_row, goto_row
+
     def build(self):
+        grammar = self.grammar
+        grammar.analyze()
+
         action_table = defaultdict(dict) 
         goto_table = defaultdict(dict)
 
-        initial_item = LR1Item(0, 0, {SymbolfromStr('$')})
-        initial_state = LR1State(closure([initial_item]))
-        states_stack = [initial_state]
-        states_set = {initial_state: 0}
+        kernels = []
+        states = []
+        states_set = {}
+        states_stack = []
+
+        def state_id(kernel):
+            if kernel not in states_set:
+                states_set[kernel] = len(kernels)
+                kernels.append(kernel)
+                states.append(None)
+                states_stack.append(states_set[kernel])
+            return states_set[kernel]
 
+        state_id(self.initial_kernel())
         while len(states_stack):
-            current_state = states_stack.pop() 
-            current_state_id = states_set[current_state] 
-            # print("current")
-            # print(current_state_id)
-            # print(current_state)
-            # print("")
-
-            items = current_state.get_reducible()
-            for production_idx, lookahead_symbols in items:
-                # print(current_state_id)
-                # print(production_idx)
-                # print(lookahead_symbols)
-                for symbol in lookahead_symbols:
-                    action_table[current_state_id][symbol] = LR1Action(1, production_idx)
-            
-            items = current_state.get_special_empty()
-            for production_idx, lookahead_symbols in items:
-                for symbol in lookahead_symbols:
-                    action_table[current_state_id][symbol] = LR1Action(2, None)
-
-            for symbol in RustGrammar.terminal_symbols:
-                symbol = SymbolfromStr(symbol)
-                next_state = state_transform(current_state, symbol)
-                if next_state:
-                    # print("next")
-                    # print(symbol)
-                    # print(next_state)
-                    if next_state not in states_set:
-                        states_set[next_state] = len(states_set)
-                        states_stack.append(next_state)
-
-                    if current_state_id in action_table and symbol in action_table[current_state_id]:
-                        raise Exception("Build error") 
-                    else:
-                        action_table[current_state_id][symbol] = LR1Action(0, states_set[next_state])
+            current_state_id = states_stack.pop()
+            current_state = LR1State(closure(grammar, kernels[current_state_id]))
+            states[current_state_id] = current_state
 
-            
-            for symbol in RustGrammar.non_terminal_symbols:
-                symbol = SymbolfromStr(symbol)
-                next_state = state_transform(current_state, symbol)
-                if next_state:
-                    # print("next")
-                    # print(symbol)
-                    # print(next_state)
-                    if next_state not in states_set:
-                        states_set[next_state] = len(states_set)
-                        states_stack.append(next_state)
-
-                    if current_state_id in goto_table and symbol in goto_table[current_state_id]:
-                        raise Exception("Build error") 
-                    else:
-                        goto_table[current_state_id][symbol] = states_set[next_state]
-
-        return LR1Table(action_table, goto_table)
+            action_table[current_state_id], goto_table[current_state_id] = self.state_rows(current_state, state_id)
+
+        return LR1Table(action_table, goto_table, kernels, states)
+
+    def rebuild(self, old_table: LR1Table, old_grammar: Grammar):
+        """
+            Build the table of `self.grammar`, an extension of `old_grammar`, from `old_table`.
+
+            Only states whose closure can change are recomputed: those with an
+            item whose remaining right side mentions a nonterminal that gained
+            productions or whose FIRST set or emptyability changed. All other
+            states keep their id and rows. States that still exist keep their
+            ids, new states are numbered after the old ones.
+        """
+        grammar = self.grammar
+        old_count = len(old_grammar.productions)
+        if [repr(p) for p in grammar.productions[:old_count]] != [repr(p) for p in old_grammar.productions]:
+            raise ValueError("Grammar is not an extension of the previous grammar")
+        old_grammar.analyze()
+        grammar.analyze()
+
+        changed = {p.left for p in grammar.productions[old_count:]}
+        for nt in grammar.non_terminal_symbols:
+            nt = SymbolfromStr(nt)
+            if (grammar.first_set[nt] != old_grammar.first_set[nt]
+                    or (nt in grammar.emptyable_set) != (nt in old_grammar.emptyable_set)):
+                changed.add(nt)
+
+        def is_affected(state: LR1State) -> bool:
+            for item in state.items:
+                for symbol in grammar.productions[item.production_idx].right[item.dot_pos:]:
+                    if symbol in changed:
+                        return True
+            return False
+
+        old_ids = {kernel: idx for idx, kernel in enumerate(old_table.kernels) if kernel is not None}
+
+        action_table = defaultdict(dict)
+        goto_table = defaultdict(dict)
+        kernels = [None] * len(old_table.kernels)
+        states = [None] * len(old_table.kernels)
+        states_set = {}
+        states_stack = []
+
+        def state_id(kernel):
+            if kernel not in states_set:
+                idx = old_ids.get(kernel)
+                if idx is None:
+                    idx = len(kernels)
+                    kernels.append(None)
+                    states.append(None)
+                kernels[idx] = kernel
+                states_set[kernel] = idx
+                states_stack.append(idx)
+            return states_set[kernel]
+
+        state_id(self.initial_kernel())
+        while len(states_stack):
+            current_state_id = states_stack.pop()
+            kernel = kernels[current_state_id]
+
+            old_state = old_table.states[current_state_id] if kernel in old_ids else None
+            if old_state is not None and not is_affected(old_state):
+                states[current_state_id] = old_state
+                action_row = dict(old_table.action_table[current_state_id])
+                goto_row = dict(old_table.goto_table[current_state_id])
+                for action in action_row.values():
+                    if action.is_shift():
+                        state_id(old_table.kernels[action.value])
+                for next_state_id in goto_row.values():
+                    state_id(old_table.kernels[next_state_id])
+            else:
+                current_state = LR1State(closure(grammar, kernel))
+                states[current_state_id] = current_state
+                action_row, goto_row = self.state_rows(current_state, state_id)
+
+            action_table[current_state_id], goto_table[current_state_id] = action_row, goto_row
+
+        return LR1Table(action_table, goto_table, kernels, states)
+
+class LazyRows:
+    """
+        Read-only view of ACTION or GOTO rows that expands states on first access
+    """
+    def __init__(self, table: 'LazyLR1Table', rows: dict):
+        self.table = table
+        self.rows = rows
+
+    def __getitem__(self, state_id: int) -> dict:
+        row = self.rows.get(state_id)
+        if row is None:
+            self.table.expand(state_id)
+            row = self.rows[state_id]
+        return row
+
+    def __contains__(self, state_id: int) -> bool:
+        return state_id in self.rows
+
+    def __len__(self):
+        return len(self.rows)
+
+    def __repr__(self):
+        return repr(self.rows)
+
+class LazyLR1Table(LR1Table):
+    """
+        LR(1) table whose states are built from their kernel when the parser
+        first reaches them. Successor kernels are numbered but not closed until
+        they are visited themselves.
+    """
+    def __init__(self, grammar: Grammar):
+        grammar.analyze()
+        self.grammar = grammar
+        self.builder = LR1TableBuilder(grammar)
+        self.states_set = {}
+        self.lock = threading.RLock()
+        self._action_rows = {}
+        self._goto_rows = {}
+        super().__init__(LazyRows(self, self._action_rows), LazyRows(self, self._goto_rows), [], [])
+        self.state_id(self.builder.initial_kernel())
+
+    def state_id(self, kernel: frozenset[LR1Item]) -> int:
+        if kernel not in self.states_set:
+            self.states_set[kernel] = len(self.kernels)
+            self.kernels.append(kernel)
+            self.states.append(None)
+        return self.states_set[kernel]
+
+    def expand(self, state_id: int) -> None:
+        with self.lock:
+            if state_id in self._action_rows:
+                return
+            if state_id >= len(self.kernels):
+                raise KeyError(state_id)
+            state = LR1State(closure(self.grammar, self.kernels[state_id]))
+            action_row, goto_row = self.builder.state_rows(state, self.state_id)
+            self.states[state_id] = state
+            self._goto_rows[state_id] = goto_row
+            self._action_rows[state_id] = action_row
+
+    def expand_all(self) -> None:
+        state_id = 0
+        while state_id < len(self.kernels):
+            self.expand(state_id)
+            state_id += 1
+
+    def explored(self) -> int:
+        return len(self._action_rows)
+
+    def save(self, path: str) -> None:
+        """
+            Write the explored part of the table as JSON, see `load`
+        """
+        with self.lock:
+            data = {
+                'fingerprint': self.grammar.fingerprint(),
+                'kernels': [
+                    [[item.production_idx, item.dot_pos, sorted(s.symbol_id for s in item.lookahead_symbols)]
+                     for item in kernel]
+                    for kernel in self.kernels
+                ],
+                'action': {
+                    state_id: {symbol.symbol_id: [action.action_type, action.value] for symbol, action in row.items()}
+                    for state_id, row in self._action_rows.items()
+                },
+                'goto': {
+                    state_id: {symbol.symbol_id: next_state_id for symbol, next_state_id in row.items()}
+                    for state_id, row in self._goto_rows.items()
+                },
+            }
+        fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)), suffix='.tmp')
+        with os.fdopen(fd, 'w') as f:
+            json.dump(data, f)
+        os.replace(temp_path, path)
+
+    @classmethod
+    def load(cls, grammar: Grammar, path: str) -> 'LazyLR1Table':
+        """
+            A table for `grammar` seeded with the states saved at `path`.
+            A missing file or one saved for another grammar is ignored.
+        """
+        table = cls(grammar)
+        try:
+            with open(path, 'r') as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return table
+        if data.get('fingerprint') != grammar.fingerprint():
+            return table
+
+        table.kernels.clear()
+        table.states.clear()
+        table.states_set.clear()
+        for kernel in data['kernels']:
+            table.state_id(frozenset(
+                LR1Item(grammar, production_idx, dot_pos, {TerminalSymbol(i) for i in lookaheads})
+                for production_idx, dot_pos, lookaheads in kernel
+            ))
+        for state_id, row in data['goto'].items():
+            table._goto_rows[int(state_id)] = {NonTerminalSymbol(int(i)): next_state_id for i, next_state_id in row.items()}
+        for state_id, row in data['action'].items():
+            table._action_rows[int(state_id)] = {TerminalSymbol(int(i)): LR1Action(t, v) for i, (t, v) in row.items()}
+        return table
+
+class FrozenLR1Table(LR1Table):
+    """
+        Immutable copy of a table that can be shared by any number of threads.
+
+        Rows are read-only mappings in tuples indexed by state id, so a lookup
+        never inserts anything. A lazy table is fully expanded first.
+    """
+    EMPTY_ROW = MappingProxyType({})
+
+    def __init__(self, table: LR1Table):
+        if isinstance(table, LazyLR1Table):
+            table.expand_all()
+        count = len(table.kernels) if table.kernels is not None else len(table.action_table)
+
+        def freeze(rows) -> tuple:
+            return tuple(
+                MappingProxyType(dict(rows[state_id])) if state_id in rows else self.EMPTY_ROW
+                for state_id in range(count)
+            )
+
+        super().__init__(freeze(table.action_table), freeze(table.goto_table))
+
+    def __contains__(self, state_id: int) -> bool:
+        return 0 <= state_id < len(self.action_table)
 
 class ASTNode:
     def __init__(self, symbol, children, val = None):
@@ -499,63 +807,284 @@ class AST:
 def SymbolfromToken(token: Token):
     return SymbolfromStr(token.type().name) 
 
-class LR1Parser:
+class GrammarRegistry:
+    """
+        Named grammars and their LR(1) tables, built lazily on first use.
+
+        Tables are keyed by grammar fingerprint, so every parser of an equal
+        grammar in the process shares one table.
+    """
     def __init__(self):
-        self.lr1_table = LR1TableBuilder().build()
+        self.grammars: dict[str, Grammar] = {}
+        self.tables: dict[str, LR1Table] = {}
+        self.lazy_tables: dict[str, LazyLR1Table] = {}
+        self.frozen_tables: dict[str, FrozenLR1Table] = {}
+        self.lock = threading.Lock()
+
+    def register(self, name: str, grammar: Grammar) -> None:
+        if name in self.grammars and self.grammars[name] is not grammar:
+            raise ValueError(f"Grammar `{name}` is already registered")
+        self.grammars[name] = grammar
+
+    def get(self, name: str) -> Grammar:
+        if name not in self.grammars:
+            raise ValueError(f"Unknown grammar: {name}")
+        return self.grammars[name]
+
+    def register_extension(self, name: str, base_name: str, productions: list[list[str]]) -> Grammar:
+        """
+            Register `base_name` plus `productions` as `name`. If the base table is
+            already built, the new table is rebuilt incrementally from it.
+        """
+        base = self.get(base_name)
+        grammar = base.extended(productions)
+        self.register(name, grammar)
+
+        base_table = self.tables.get(base.fingerprint())
+        if base_table is not None and base_table.kernels is not None:
+            with self.lock:
+                key = grammar.fingerprint()
+                if key not in self.tables:
+                    self.tables[key] = LR1TableBuilder(grammar).rebuild(base_table, base)
+        return grammar
+
+    def table(self, grammar: Grammar) -> LR1Table:
+        key = grammar.fingerprint()
+        table = self.tables.get(key)
+        if table is None:
+            with self.lock:
+                table = self.tables.get(key)
+                if table is None:
+                    table = LR1TableBuilder(grammar).build()
+                    self.tables[key] = table
+        return table
+
+    def lazy_table(self, grammar: Grammar, path: str | None = None) -> LR1Table:
+        """
+            A table that builds states on demand, shared like `table`. A fully
+            built table is returned if there is one. `path` seeds a new lazy
+            table with states saved by `LazyLR1Table.save`.
+        """
+        key = grammar.fingerprint()
+        table = self.tables.get(key) or self.lazy_tables.get(key)
+        if table is None:
+            with self.lock:
+                table = self.lazy_tables.get(key)
+                if table is None:
+                    table = LazyLR1Table.load(grammar, path) if path is not None else LazyLR1Table(grammar)
+                    self.lazy_tables[key] = table
+        return table
+
+    def frozen_table(self, grammar: Grammar) -> FrozenLR1Table:
+        key = grammar.fingerprint()
+        table = self.frozen_tables.get(key)
+        if table is None:
+            base = self.tables.get(key) or self.lazy_tables.get(key) or self.table(grammar)
+            with self.lock:
+                table = self.frozen_tables.get(key)
+                if table is None:
+                    table = FrozenLR1Table(base)
+                    self.frozen_tables[key] = table
+        return table
+
+Grammars = GrammarRegistry()
+Grammars.register("rust", RustGrammar)
+
+class LR1Parser:
+    def __init__(self, grammar: Grammar | str = RustGrammar, lazy: bool = False, table_file: str | None = None,
+                 frozen: bool = False):
+        """
+            With `lazy`, states are built the first time a parse reaches them,
+            `table_file` seeds them from `LazyLR1Table.save` output.
+            With `frozen`, the parser uses the shared immutable table and can be
+            used from several threads at once.
+        """
+        if lazy and frozen:
+            raise ValueError("A parser cannot be both lazy and frozen")
+        if isinstance(grammar, str):
+            grammar = Grammars.get(grammar)
+        self.grammar = grammar
+        if frozen:
+            self.lr1_table = Grammars.frozen_table(grammar)
+        elif lazy:
+            self.lr1_table = Grammars.lazy_table(grammar, table_file)
+        else:
+            self.lr1_table = Grammars.table(grammar)
 
     def parse(self, tokens: list[Token]):
-        symbol_stack = [] # (ASTNode)
-        state_stack = []
+        return parse_tokens(self.grammar, self.lr1_table, tokens)
+
+def parse_tokens(grammar: Grammar, lr1_table: LR1Table, tokens: list[Token]) -> AST:
+    """
+        Reentrant LR(1) parse, all parse state is local to the call
+    """
+    symbol_stack = [] # (ASTNode)
+    state_stack = []
+
+    symbol_stack.append(ASTNode(SymbolfromStr('Program'), None))
+    state_stack.append(0)
+    idx = 0
+
+    while True:
+        state = state_stack[-1]
+        token = tokens[idx]
+
+        # print("") 
+        # print(state)
+        # for symbol in symbol_stack:
+        #     print(symbol)
+        # print(idx)
+        # print(token)
+        # print("")
+
+        action = lr1_table.action_table[state].get(SymbolfromToken(token))
+        if action is None:
+            raise Exception(f"Parse error: unexpected {token} at {token.describe_location()}")
+
+        if action.is_shift():
+            next_state = action.value
+            symbol_stack.append(ASTNode(SymbolfromToken(token), None, token))
+            state_stack.append(next_state)
+            idx += 1
+        elif action.is_reduce():
+            production_idx = action.value
+            production = grammar.productions[production_idx]
+
+            childs = symbol_stack[-len(production.right):] 
+
+            symbol_stack = symbol_stack[:len(symbol_stack) - len(production.right)] 
+            state_stack = state_stack[:len(state_stack) - len(production.right)]
+            
+            state = state_stack[-1]
+            if production.left == grammar.start_symbol:  # parse End
+                return AST(ASTNode(production.left, childs))
 
-        symbol_stack.append(ASTNode(SymbolfromStr('Program'), None))
-        state_stack.append(0)
+            next_state = lr1_table.goto_table[state][production.left]
+            symbol_stack.append(ASTNode(production.left, childs))
+            state_stack.append(next_state)
+        elif action.is_special_empty():
+            next_state = lr1_table.goto_table[state][SymbolfromStr("Empty")]
+            symbol_stack.append(ASTNode(SymbolfromStr("Empty"), None))
+            state_stack.append(next_state)
+        else:
+            raise Exception("Parse error")
+
+class ParserSession:
+    """
+        Reusable parse state for parsing many small inputs in a row.
+
+        The symbol and state stacks are preallocated lists addressed by a top
+        index: a reduce truncates by moving the index instead of copying the
+        stack, and the lists only grow (in place) when an input nests deeper
+        than any before it. With `arena`, AST nodes are recycled from the
+        previous parse, so a returned tree is only valid until the next call.
+        A session is not thread-safe, use one per thread.
+    """
+    def __init__(self, parser: 'LR1Parser | None' = None, capacity: int = 64, arena: bool = False):
+        if parser is None:
+            parser = LR1Parser()
+        self.grammar = parser.grammar
+        self.lr1_table = parser.lr1_table
+        self.symbol_stack: list = [None] * capacity
+        self.state_stack: list[int] = [0] * capacity
+        self.arena: list[ASTNode] | None = [] if arena else None
+        self.arena_used = 0
+        self.token_symbols: dict = {}   # {TokenType: TerminalSymbol}
+        self.empty_symbol = SymbolfromStr("Empty")
+        self.bottom = ASTNode(SymbolfromStr('Program'), None)
+
+    def grow(self) -> None:
+        self.symbol_stack.extend([None] * len(self.symbol_stack))
+        self.state_stack.extend([0] * len(self.state_stack))
+
+    def new_node(self, symbol, children, val = None) -> ASTNode:
+        arena = self.arena
+        if arena is None:
+            return ASTNode(symbol, children, val)
+        if self.arena_used < len(arena):
+            node = arena[self.arena_used]
+            node.symbol = symbol
+            node.children = children
+            node.val = val
+        else:
+            node = ASTNode(symbol, children, val)
+            arena.append(node)
+        self.arena_used += 1
+        return node
+
+    def parse(self, tokens: list[Token]) -> AST:
+        self.arena_used = 0
+        symbol_stack = self.symbol_stack
+        state_stack = self.state_stack
+        action_table = self.lr1_table.action_table
+        goto_table = self.lr1_table.goto_table
+        productions = self.grammar.productions
+        start_symbol = self.grammar.start_symbol
+        token_symbols = self.token_symbols
+        new_node = self.new_node
+
+        symbol_stack[0] = self.bottom
+        state_stack[0] = 0
+        top = 1
         idx = 0
 
         while True:
-            state = state_stack[-1]
+            state = state_stack[top - 1]
             token = tokens[idx]
+            symbol = token_symbols.get(token.type())
+            if symbol is None:
+                symbol = token_symbols[token.type()] = SymbolfromToken(token)
 
-            # print("") 
-            # print(state)
-            # for symbol in symbol_stack:
-            #     print(symbol)
-            # print(idx)
-            # print(token)
-            # print("")
+            action = action_table[state].get(symbol)
+            if action is None:
+                raise Exception(f"Parse error: unexpected {token} at {token.describe_location()}")
 
-            action = self.lr1_table.action_table[state][SymbolfromToken(token)]
+            if top == len(symbol_stack):
+                self.grow()
 
-            if action.is_shift():
-                next_state = action.value
-                symbol_stack.append(ASTNode(SymbolfromToken(token), None, token))
-                state_stack.append(next_state)
+            if action.action_type == 0:     # shift
+                symbol_stack[top] = new_node(symbol, None, token)
+                state_stack[top] = action.value
+                top += 1
                 idx += 1
-            elif action.is_reduce():
-                production_idx = action.value
-                production = RustGrammar.productions[production_idx]
+            elif action.action_type == 1:   # reduce
+                production = productions[action.value]
+                count = len(production.right)
 
-                childs = symbol_stack[-len(production.right):] 
+                childs = symbol_stack[top - count:top]
+                top -= count
 
-                symbol_stack = symbol_stack[:len(symbol_stack) - len(production.right)] 
-                state_stack = state_stack[:len(state_stack) - len(production.right)]
-                
-                state = state_stack[-1]
-                if production.left == SymbolfromStr("Program"):  # parse End
-                    return AST(ASTNode(production.left, childs))
-
-                next_state = self.lr1_table.goto_table[state][production.left]
-                symbol_stack.append(ASTNode(production.left, childs))
-                state_stack.append(next_state)
-            elif action.is_special_empty():
-                next_state = self.lr1_table.goto_table[state][SymbolfromStr("Empty")]
-                symbol_stack.append(ASTNode(SymbolfromStr("Empty"), None))
-                state_stack.append(next_state)
+                if production.left == start_symbol:  # parse End
+                    return AST(new_node(production.left, childs))
+
+                symbol_stack[top] = new_node(production.left, childs)
+                state_stack[top] = goto_table[state_stack[top - 1]][production.left]
+                top += 1
+            elif action.action_type == 2:   # special empty
+                symbol_stack[top] = new_node(self.empty_symbol, None)
+                state_stack[top] = goto_table[state][self.empty_symbol]
+                top += 1
             else:
                 raise Exception("Parse error")
 
+    def parse_many(self, token_streams: list[list[Token]], consume = None) -> list:
+        """
+            Parse each stream in turn, returns the ASTs or `consume(ast)` results.
+
+            With an arena every tree is recycled by the next parse, so `consume`
+            is required to extract what is needed before that happens.
+        """
+        if self.arena is not None and consume is None:
+            raise ValueError("parse_many with an arena needs `consume`, trees are reused between parses")
+        results = []
+        for tokens in token_streams:
+            ast = self.parse(tokens)
+            results.append(consume(ast) if consume is not None else ast)
+        return results
+
 if __name__ == "__main__":
     RustGrammar.compute_first_set()
     # print(RustGrammar.emptyable_set)
     # print(RustGrammar.first_set)
-    table = LR1TableBuilder().build()
+    table = LR1TableBuilder(RustGrammar).build()
     
\ No newline at end of file
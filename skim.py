@@ -0,0 +1,121 @@
+import re
+
+from ttoken import Token
+from lexer import COMMENT_PATTERN, Lexer
+from lineindex import LineIndex
+from parser import AST, ASTNode, LR1Parser, SymbolfromStr
+import ttoken as tt
+
+# Comments first so braces and `fn` inside them are never matched
+SKIM_PATTERN = re.compile(COMMENT_PATTERN.pattern + r'|[{}]|\bfn\b', re.S)
+
+class FunctionSignature:
+    def __init__(self, name: str, parameters: list[tuple[str, str, bool]], return_type: str | None,
+                 pos: int, line: int, column: int):
+        self.name = name
+        self.parameters = parameters    # [(name, type, mutable)]
+        self.return_type = return_type
+        self.pos = pos
+        self.line = line
+        self.column = column
+
+    def __repr__(self):
+        params = ', '.join(f'{"mut " if mut else ""}{name}: {type}' for name, type, mut in self.parameters)
+        ret = f' -> {self.return_type}' if self.return_type is not None else ''
+        return f'fn {self.name}({params}){ret}'
+
+def find_headers(text: str) -> list[tuple[int, int]]:
+    """
+        (start, end) of every top-level `fn` header, end is its body's `{`.
+
+        Bodies are skipped by counting braces at the character level.
+    """
+    headers = []
+    line_index = LineIndex(text)
+    depth = 0
+    header_start = None
+    body_start = None
+
+    for m in SKIM_PATTERN.finditer(text):
+        lexeme = m.group()
+        if lexeme == '{':
+            if depth == 0 and header_start is not None:
+                headers.append((header_start, m.start()))
+                header_start = None
+            if depth == 0:
+                body_start = m.start()
+            depth += 1
+        elif lexeme == '}':
+            if depth == 0:
+                raise ValueError(f'Unmatched `}}` at {line_index.describe(m.start())}')
+            depth -= 1
+        elif lexeme == 'fn' and depth == 0:
+            if header_start is not None:
+                raise ValueError(f'Missing function body for `fn` at {line_index.describe(header_start)}')
+            header_start = m.start()
+
+    if depth != 0:
+        raise ValueError(f'Unterminated function body `{{` at {line_index.describe(body_start)}')
+    if header_start is not None:
+        raise ValueError(f'Missing function body for `fn` at {line_index.describe(header_start)}')
+    return headers
+
+def find_child(node: ASTNode, name: str) -> ASTNode | None:
+    symbol = SymbolfromStr(name)
+    for child in node.children or []:
+        if child.symbol == symbol:
+            return child
+    return None
+
+def header_to_signature(header: ASTNode) -> FunctionSignature:
+    # FunctionHeaderDeclare -> fn ID ( ParameterList ) [-> Type]
+    name_token = header.children[1].val
+
+    parameters = []
+    param_list = find_child(header, 'ParameterList')
+    while param_list is not None:
+        param = find_child(param_list, 'Parameter')
+        if param is None:
+            break
+        # Parameter -> VarDeclareInner : Type, VarDeclareInner -> [mut] ID
+        inner, _, type_node = param.children
+        parameters.append((inner.children[-1].val.value(), type_node.children[0].val.value(), len(inner.children) == 2))
+        param_list = find_child(param_list, 'ParameterList')
+
+    return_type = None
+    type_node = find_child(header, 'Type')
+    if type_node is not None:
+        return_type = type_node.children[0].val.value()
+
+    fn_pos = header.children[0].val.pos()
+    line, column = header.children[0].val.location()
+    return FunctionSignature(name_token.value(), parameters, return_type, fn_pos, line, column)
+
+def skim_signatures(text: str, parser: LR1Parser) -> list[FunctionSignature]:
+    """
+        Index the top-level function signatures without parsing any body.
+
+        Each header is lexed on its own and parsed with the full LR(1) table as
+        a function with an empty body, so headers get the usual diagnostics.
+    """
+    line_index = LineIndex(text)
+    signatures = []
+
+    for start, end in find_headers(text):
+        lexer = Lexer(text, start, end)
+        lexer.line_index = line_index
+        tokens = lexer.tokenize()
+        end_token = tokens.pop()
+        tokens += [
+            Token(tt.TT_LBRACE, '{', end, line_index),
+            Token(tt.TT_RBRACE, '}', end, line_index),
+            end_token,
+        ]
+
+        ast: AST = parser.parse(tokens)
+        # Program -> DeclareList -> Declare DeclareList, Declare -> FunctionDeclare
+        function = ast.root.children[0].children[0].children[0]
+        header = find_child(function, 'FunctionHeaderDeclare')
+        signatures.append(header_to_signature(header))
+
+    return signatures
@@ -6,7 +6,11 @@ from astprint import *
 def export_tokens(tokens: list[Token], filename: str) -> None:
     with open(filename, 'w') as f:
         for token in tokens:
-            f.write(f'{token}\n')
+            location = token.location()
+            if location is None:
+                f.write(f'{token}\n')
+            else:
+                f.write(f'{location[0]}:{location[1]}\t{token}\n')
 
 if __name__ == "__main__":
     if len(sys.argv) != 2:
@@ -29,8 +33,7 @@ if __name__ == "__main__":
 
     print(f'Tokens exported to: {tokens_path}')
 
-    RustGrammar.compute_first_set()
     parser = LR1Parser()
-    ast = LR1Parser().parse(tokens) 
+    ast = parser.parse(tokens)
     image_path = ast_to_png(ast)
     print(f'AST visualization saved to: {image_path}')
@@ -1,4 +1,7 @@
+from lineindex import LineIndex
+
 TOKEN_TYPE_LIST = []
+TOKEN_TYPE_BY_ID: list['TokenType'] = []
 
 class TokenType:
     _next_id = 0
@@ -26,12 +29,16 @@ def _make_token_type(name: str) -> TokenType:
 
     id = TokenType._next_id
     TokenType._next_id += 1
-    return TokenType(id, name)
+    token_type = TokenType(id, name)
+    TOKEN_TYPE_BY_ID.append(token_type)
+    return token_type
 
 class Token:
-    def __init__(self, type: TokenType, value: str):
+    def __init__(self, type: TokenType, value: str, pos: int = -1, line_index: LineIndex | None = None):
         self._type = type
         self._value = value
+        self._pos = pos
+        self._line_index = line_index
     
     def __repr__(self) -> str:
         return f'Token({repr(self._type)}, `{self._value}`)'
@@ -45,6 +52,22 @@ class Token:
     def value(self) -> str:
         return self._value
 
+    def pos(self) -> int:
+        return self._pos
+
+    def location(self) -> tuple[int, int] | None:
+        """
+            (line, column) of the first character, or None if unknown
+        """
+        if self._line_index is None or self._pos < 0:
+            return None
+        return self._line_index.location(self._pos)
+
+    def describe_location(self) -> str:
+        if self._line_index is None or self._pos < 0:
+            return 'unknown position'
+        return self._line_index.describe(self._pos)
+
 TT_I32 = _make_token_type('i32')
 TT_LET = _make_token_type('let')
 TT_IF = _make_token_type('if')
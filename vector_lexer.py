@@ -0,0 +1,158 @@
+import numpy as np
+
+from ttoken import Token, TokenType
+from lexer import KEYWORDS, Lexer
+from lineindex import LineIndex
+import ttoken as tt
+
+CLS_OTHER = 0
+CLS_SPACE = 1
+CLS_DIGIT = 2
+CLS_IDENT = 3   # letters and '_', may start an identifier
+
+CLASS_TABLE = np.zeros(256, dtype=np.uint8)
+for _c in range(128):
+    _ch = chr(_c)
+    if _ch.isspace():
+        CLASS_TABLE[_c] = CLS_SPACE
+    elif _ch.isdigit():
+        CLASS_TABLE[_c] = CLS_DIGIT
+    elif _ch.isalpha() or _ch == '_':
+        CLASS_TABLE[_c] = CLS_IDENT
+
+TWO_CHAR_MAP = {
+    '==': tt.TT_EQ, '>=': tt.TT_GTE, '<=': tt.TT_LTE, '!=': tt.TT_NE,
+    '->': tt.TT_ARROW, '..': tt.TT_DOTDOT,
+}
+
+SINGLE_CHAR_MAP = {
+    '=': tt.TT_EQUAL, '+': tt.TT_PLUS, '-': tt.TT_MINUS, '*': tt.TT_MUL, '/': tt.TT_DIV,
+    '>': tt.TT_GT, '<': tt.TT_LT,
+    '(': tt.TT_LP, ')': tt.TT_RP,
+    '{': tt.TT_LBRACE, '}': tt.TT_RBRACE,
+    '[': tt.TT_LBRACKET, ']': tt.TT_RBRACKET,
+    ';': tt.TT_SEMICOLON, ':': tt.TT_COLON, ',': tt.TT_COMMA, '.': tt.TT_DOT
+}
+
+def find_runs(mask: np.ndarray) -> tuple[list[int], list[int]]:
+    """
+        (starts, ends) of every maximal run of True in `mask`, ends exclusive
+    """
+    padded = np.zeros(len(mask) + 2, dtype=np.int8)
+    padded[1:-1] = mask
+    diff = np.diff(padded)
+    return np.flatnonzero(diff == 1).tolist(), np.flatnonzero(diff == -1).tolist()
+
+class RunCursor:
+    """
+        Walks a sorted list of runs forward, the lexer position never goes back.
+    """
+    def __init__(self, runs: tuple[list[int], list[int]]):
+        self.starts, self.ends = runs
+        self.idx = 0
+
+    def end_of_run_at(self, pos: int) -> int:
+        ends = self.ends
+        idx = self.idx
+        while ends[idx] <= pos:
+            idx += 1
+        self.idx = idx
+        return ends[idx]
+
+class VectorLexer:
+    """
+        Lexer that classifies the whole buffer with NumPy before the scalar loop.
+
+        Whitespace, number and identifier spans are taken from precomputed run
+        boundaries; only punctuation and comments are handled per character.
+        Produces the same tokens and errors as `Lexer`, non-ASCII input is
+        delegated to it.
+    """
+    def __init__(self, text: str):
+        self.tokens: list[Token] = []
+        self.text = text
+        self.line_index = LineIndex(text)
+
+    def describe(self, pos: int) -> str:
+        return self.line_index.describe(pos)
+
+    def make_token(self, type: TokenType, value: str, pos: int) -> Token:
+        return Token(type, value, pos, self.line_index)
+
+    def classify(self) -> np.ndarray:
+        data = np.frombuffer(self.text.encode('ascii'), dtype=np.uint8)
+        return CLASS_TABLE[data]
+
+    def tokenize(self) -> list[Token]:
+        text = self.text
+        if not text.isascii():
+            lexer = Lexer(text)
+            lexer.line_index = self.line_index
+            self.tokens = lexer.tokenize()
+            return self.tokens
+
+        classes = self.classify()
+        spaces = RunCursor(find_runs(classes == CLS_SPACE))
+        digits = RunCursor(find_runs(classes == CLS_DIGIT))
+        words = RunCursor(find_runs(classes >= CLS_DIGIT))
+        classes = classes.tolist()
+
+        tokens = self.tokens
+        length = len(text)
+        pos = 0
+
+        while pos < length:
+            cls = classes[pos]
+
+            if cls == CLS_SPACE:
+                pos = spaces.end_of_run_at(pos)
+                continue
+
+            if cls == CLS_DIGIT:
+                end = digits.end_of_run_at(pos)
+                if end < length and text[end].isalpha():
+                    raise ValueError(f"Unexpected `{text[end]}` in number at {self.describe(end)}.")
+                tokens.append(self.make_token(tt.TT_NUMBER, text[pos:end], pos))
+                pos = end
+                continue
+
+            if cls == CLS_IDENT:
+                end = words.end_of_run_at(pos)
+                ident_str = text[pos:end]
+                tokens.append(self.make_token(KEYWORDS.get(ident_str, tt.TT_IDENTIFIER), ident_str, pos))
+                pos = end
+                continue
+
+            ch = text[pos]
+            pair = text[pos:pos + 2]
+
+            if pair == '//':
+                end = text.find('\n', pos)
+                pos = length if end == -1 else end
+                continue
+
+            if pair == '/*':
+                end = text.find('*/', pos + 2)
+                if end == -1:
+                    raise ValueError(f'Unterminated multi-line comment at {self.describe(length)}')
+                pos = end + 2
+                continue
+
+            if pair in TWO_CHAR_MAP:
+                tokens.append(self.make_token(TWO_CHAR_MAP[pair], pair, pos))
+                pos += 2
+                continue
+
+            if ch in SINGLE_CHAR_MAP:
+                tokens.append(self.make_token(SINGLE_CHAR_MAP[ch], ch, pos))
+                pos += 1
+                continue
+
+            raise ValueError(f"Unknown `{ch}` at {self.describe(pos)}")
+
+        tokens.append(self.make_token(tt.TT_END, '$', length))
+        return tokens
+
+def run_vector_lexer(text: str) -> list[Token]:
+    lexer = VectorLexer(text)
+    return lexer.tokenize()